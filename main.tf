@@ -5,6 +5,15 @@ locals {
 module "iam" {
   source = "./terraform/modules/iam"
 
+  name_prefix            = local.prefix
+  enable_fleet_state     = var.enable_fleet_state
+  fleet_state_bucket_arn = var.enable_fleet_state ? module.fleet_state[0].bucket_arn : ""
+}
+
+module "fleet_state" {
+  source = "./terraform/modules/fleet_state"
+  count  = var.enable_fleet_state ? 1 : 0
+
   name_prefix = local.prefix
 }
 
@@ -25,6 +34,8 @@ module "lambda" {
   max_parallel_addons         = var.max_parallel_addons
   max_addons_per_run          = var.max_addons_per_run
   dry_run                     = var.dry_run
+  enable_fleet_state          = var.enable_fleet_state
+  fleet_state_bucket          = var.enable_fleet_state ? module.fleet_state[0].bucket_name : ""
   lambda_eks_checker_role_arn = module.iam.lambda_eks_checker_role_arn
   lambda_nodegroup_role_arn   = module.iam.lambda_nodegroup_role_arn
 }
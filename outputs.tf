@@ -87,3 +87,8 @@ output "iam_nodegroup_scheduler_role_arn" {
   description = "ARN of the IAM role for node group scheduler"
   value       = module.iam.nodegroup_scheduler_role_arn
 }
+
+output "fleet_state_bucket_name" {
+  description = "Name of the S3 bucket holding the fleet-state databases (null when disabled)"
+  value       = var.enable_fleet_state ? module.fleet_state[0].bucket_name : null
+}
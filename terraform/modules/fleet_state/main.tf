@@ -0,0 +1,54 @@
+locals {
+  prefix = var.name_prefix
+}
+
+data "aws_caller_identity" "current" {}
+
+resource "aws_s3_bucket" "fleet_state" {
+  bucket        = "${local.prefix}eks-fleet-state-${data.aws_caller_identity.current.account_id}"
+  force_destroy = true
+}
+
+resource "aws_s3_bucket_versioning" "fleet_state" {
+  bucket = aws_s3_bucket.fleet_state.id
+
+  versioning_configuration {
+    status = "Enabled"
+  }
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "fleet_state" {
+  bucket = aws_s3_bucket.fleet_state.id
+
+  rule {
+    id     = "expire-noncurrent-versions"
+    status = "Enabled"
+
+    filter {}
+
+    noncurrent_version_expiration {
+      noncurrent_days = var.noncurrent_version_retention_days
+    }
+  }
+
+  depends_on = [aws_s3_bucket_versioning.fleet_state]
+}
+
+resource "aws_s3_bucket_server_side_encryption_configuration" "fleet_state" {
+  bucket = aws_s3_bucket.fleet_state.id
+
+  rule {
+    apply_server_side_encryption_by_default {
+      sse_algorithm = "AES256"
+    }
+  }
+}
+
+resource "aws_s3_bucket_public_access_block" "fleet_state" {
+  bucket = aws_s3_bucket.fleet_state.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
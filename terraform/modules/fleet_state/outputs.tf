@@ -0,0 +1,7 @@
+output "bucket_name" {
+  value = aws_s3_bucket.fleet_state.id
+}
+
+output "bucket_arn" {
+  value = aws_s3_bucket.fleet_state.arn
+}
@@ -0,0 +1,11 @@
+variable "name_prefix" {
+  type        = string
+  default     = ""
+  description = "Optional prefix for resource names"
+}
+
+variable "noncurrent_version_retention_days" {
+  type        = number
+  default     = 30
+  description = "Days to keep superseded copies of the fleet-state databases"
+}
@@ -113,3 +113,33 @@ resource "aws_iam_role" "nodegroup_scheduler" {
     }]
   })
 }
+
+resource "aws_iam_role_policy" "lambda_eks_checker_fleet_state" {
+  count = var.enable_fleet_state ? 1 : 0
+  name  = "FleetStateAccess"
+  role  = aws_iam_role.lambda_eks_checker.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect   = "Allow"
+      Action   = ["s3:GetObject", "s3:PutObject", "s3:ListBucket"]
+      Resource = [var.fleet_state_bucket_arn, "${var.fleet_state_bucket_arn}/*"]
+    }]
+  })
+}
+
+resource "aws_iam_role_policy" "lambda_nodegroup_fleet_state" {
+  count = var.enable_fleet_state ? 1 : 0
+  name  = "FleetStateAccess"
+  role  = aws_iam_role.lambda_nodegroup.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect   = "Allow"
+      Action   = ["s3:GetObject", "s3:PutObject", "s3:ListBucket"]
+      Resource = [var.fleet_state_bucket_arn, "${var.fleet_state_bucket_arn}/*"]
+    }]
+  })
+}
@@ -3,3 +3,15 @@ variable "name_prefix" {
   default     = ""
   description = "Optional prefix for resource names"
 }
+
+variable "enable_fleet_state" {
+  type        = bool
+  default     = false
+  description = "Grant the Lambda roles read/write access to the fleet-state bucket"
+}
+
+variable "fleet_state_bucket_arn" {
+  type        = string
+  default     = ""
+  description = "ARN of the S3 bucket holding the fleet-state databases"
+}
@@ -0,0 +1,38 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, 'shared'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+def load_checker(name):
+    """Import <name>/index.py under a unique module name (both Lambdas use index.py)."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, name, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class StubSNS:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, TopicArn, Subject, Message):
+        self.messages.append({'Subject': Subject, 'Message': Message})
+
+
+@pytest.fixture
+def sns():
+    return StubSNS()
+
+
+@pytest.fixture
+def store(tmp_path):
+    import fleet_state
+    s = fleet_state.FleetStateStore(str(tmp_path / 'fleet_state.db'))
+    yield s
+    s.close()
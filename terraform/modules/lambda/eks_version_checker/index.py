@@ -2,7 +2,9 @@ import boto3
 import os
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
+
+import fleet_state
 
 
 def get_next_version(current_version: str, available_versions: List[str]) -> Optional[str]:
@@ -122,28 +124,28 @@ def compare_versions(version1: str, version2: str) -> str:
 
 def check_addon_update_available(eks_client, cluster_name: str, addon_name: str,
                                   current_version: str, cluster_k8s_version: str) -> Optional[str]:
-    """Latest addon version if update available, else None."""
-    try:
-        response = eks_client.describe_addon_versions(
-            addonName=addon_name,
-            kubernetesVersion=cluster_k8s_version
-        )
-        addon_versions = response.get('addons', [])
-        if not addon_versions:
-            return None
-        addon_info = addon_versions[0]
-        addon_version_infos = addon_info.get('addonVersions', [])
-        if not addon_version_infos:
-            return None
-        latest_version = addon_version_infos[0].get('addonVersion')
-        if not latest_version:
-            return None
-        if compare_versions(current_version, latest_version) == 'older':
-            return latest_version
+    """Latest addon version if update available, else None.
+
+    API errors are raised so the caller can retry throttling and report the addon as failed
+    rather than up to date.
+    """
+    response = eks_client.describe_addon_versions(
+        addonName=addon_name,
+        kubernetesVersion=cluster_k8s_version
+    )
+    addon_versions = response.get('addons', [])
+    if not addon_versions:
         return None
-    except Exception as e:
-        print(f"Error checking addon version for {addon_name}: {str(e)}")
+    addon_info = addon_versions[0]
+    addon_version_infos = addon_info.get('addonVersions', [])
+    if not addon_version_infos:
         return None
+    latest_version = addon_version_infos[0].get('addonVersion')
+    if not latest_version:
+        return None
+    if compare_versions(current_version, latest_version) == 'older':
+        return latest_version
+    return None
 
 
 def update_addon_with_auth_preservation(eks_client, cluster_name: str, addon_name: str,
@@ -181,8 +183,12 @@ def format_auth(auth_type):
     return {'pod_identity': 'Pod Identity', 'irsa': 'IRSA', 'none': 'None'}.get(auth_type, auth_type)
 
 
-def send_cluster_addon_summary(sns_client, sns_topic_arn: str, cluster_name: str, addon_results: List[Dict]) -> None:
-    """Send one SNS message with all addon results for the cluster."""
+def send_cluster_addon_summary(sns_client, sns_topic_arn: str, cluster_name: str, addon_results: List[Dict],
+                               changed_addons: Optional[Set[str]] = None) -> None:
+    """Send one SNS message with all addon results for the cluster.
+
+    With changed_addons (from the fleet-state store) only up-to-date addons that changed since the last run are listed.
+    """
     if not addon_results:
         return
     up_to_date_count = sum(1 for a in addon_results if a['status'] == 'up_to_date')
@@ -226,12 +232,18 @@ def send_cluster_addon_summary(sns_client, sns_topic_arn: str, cluster_name: str
                     f"  Error: {addon.get('error', 'Unknown error')}", ""
                 ])
         message_parts.append("")
-    if up_to_date_count > 0:
+    up_to_date = [a for a in addon_results if a['status'] == 'up_to_date']
+    if changed_addons is not None:
+        unchanged_count = sum(1 for a in up_to_date if a['addon_name'] not in changed_addons)
+        up_to_date = [a for a in up_to_date if a['addon_name'] in changed_addons]
+        if unchanged_count > 0:
+            message_parts.append(f"Up-to-date addons unchanged since last run: {unchanged_count}")
+            message_parts.append("")
+    if up_to_date:
         message_parts.append("UP-TO-DATE ADDONS:")
         message_parts.append("-" * 60)
-        for addon in addon_results:
-            if addon['status'] == 'up_to_date':
-                message_parts.append(f"  {addon['addon_name']} ({addon['current_version']}) - {format_auth(addon['auth_type'])}")
+        for addon in up_to_date:
+            message_parts.append(f"  {addon['addon_name']} ({addon['current_version']}) - {format_auth(addon['auth_type'])}")
         message_parts.append("")
     try:
         sns_client.publish(TopicArn=sns_topic_arn, Subject=subject, Message="\n".join(message_parts))
@@ -240,7 +252,8 @@ def send_cluster_addon_summary(sns_client, sns_topic_arn: str, cluster_name: str
 
 
 def process_cluster_addons(eks_client, sns_client, cluster_name: str, cluster_k8s_version: str,
-                           sns_topic_arn: str, dry_run: bool = False) -> List[Dict]:
+                           sns_topic_arn: str, dry_run: bool = False,
+                           store: Optional[fleet_state.FleetStateStore] = None) -> List[Dict]:
     """Check and optionally update all addons with parallel processing; send one summary SNS."""
     results = []
     try:
@@ -255,7 +268,7 @@ def process_cluster_addons(eks_client, sns_client, cluster_name: str, cluster_k8
     
     addons_to_process = addons[:max_addons]
     if len(addons) > max_addons:
-        print(f"Processing first {max_addons} of {len(addons)} addons. Remaining will be processed in next run.")
+        print(f"Processing first {max_addons} of {len(addons)} addons. Remaining addons are not checked.")
     
     def process_single_addon(addon_info: Dict) -> Dict:
         addon_name = addon_info.get('addon_name')
@@ -333,7 +346,22 @@ def process_cluster_addons(eks_client, sns_client, cluster_name: str, cluster_k8
                     'error': str(e)
                 })
     
-    send_cluster_addon_summary(sns_client, sns_topic_arn, cluster_name, results)
+    changed_addons = None
+    if store:
+        # A failure before the version check (no target_version) says nothing about whether the addon is behind.
+        entities = [{'name': r['addon_name'], 'version': r['current_version'], 'target_version': r['target_version'],
+                     'status': 'error' if r['status'] == 'failed' and not r['target_version'] else r['status']}
+                    for r in results]
+        # Addons past MAX_ADDONS_PER_RUN are never checked; record them as skipped so their version and
+        # presence stay current without touching lag.
+        entities.extend({'name': a.get('addon_name'), 'version': a.get('addon_version'), 'status': 'skipped'}
+                        for a in addons[max_addons:])
+        try:
+            changes = store.record(cluster_name, 'addon', entities)
+            changed_addons = {c['name'] for c in changes}
+        except Exception as e:
+            print(f"Error recording addon state for cluster {cluster_name}: {str(e)}")
+    send_cluster_addon_summary(sns_client, sns_topic_arn, cluster_name, results, changed_addons)
     return results
 
 
@@ -385,52 +413,77 @@ def lambda_handler(event, context):
     cluster_versions_response = eks.describe_cluster_versions()
     available_versions = [v['clusterVersion'] for v in cluster_versions_response.get('clusterVersions', [])]
     latest_available = available_versions[0] if available_versions else 'unknown'
+    # Dry runs report simulated statuses; keep them out of the history so lag/upgrade metrics stay real.
+    store = None if dry_run else fleet_state.open_store('eks_version_checker')
+    if store:
+        store.begin_run()
     results = []
-    for cluster_name in clusters:
-        try:
-            cluster_info = eks.describe_cluster(name=cluster_name)['cluster']
-            current_version = cluster_info.get('version')
-            tags = cluster_info.get('tags', {})
-            if not cluster_matches_target_environments(cluster_name, tags, target_envs):
-                continue
-            cluster_result = {'cluster': cluster_name}
-            next_version = get_next_version(current_version, available_versions) if current_version else None
-            if not next_version:
-                message = f"EKS cluster '{cluster_name}' is up to date\nCurrent version: {current_version}\nLatest available: {latest_available}"
-                if dry_run:
-                    print(f"[DRY RUN] Would send SNS: {message}")
-                else:
-                    sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster is up to date - {cluster_name}", Message=message)
-                cluster_result['status'] = 'up_to_date'
-            else:
-                insights = eks.list_insights(clusterName=cluster_name, filter={'categories': ['UPGRADE_READINESS']})
-                non_passing = [i for i in insights.get('insights', []) if i.get('insightStatus', {}).get('status') != 'PASSING']
-                if non_passing:
-                    message = f"EKS cluster '{cluster_name}' upgrade blocked: {len(non_passing)} failing insights\nCurrent version: {current_version}\nNext version: {next_version}"
+    try:
+        for cluster_name in clusters:
+            try:
+                cluster_info = eks.describe_cluster(name=cluster_name)['cluster']
+                current_version = cluster_info.get('version')
+                tags = cluster_info.get('tags', {})
+                if not cluster_matches_target_environments(cluster_name, tags, target_envs):
+                    continue
+                cluster_result = {'cluster': cluster_name}
+                next_version = get_next_version(current_version, available_versions) if current_version else None
+                if not next_version:
+                    message = f"EKS cluster '{cluster_name}' is up to date\nCurrent version: {current_version}\nLatest available: {latest_available}"
                     if dry_run:
                         print(f"[DRY RUN] Would send SNS: {message}")
                     else:
-                        sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster Upgrade Blocked due to Potential Issue - {cluster_name}", Message=message)
-                    cluster_result['status'] = 'blocked'
-                    cluster_result['issues'] = len(non_passing)
+                        sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster is up to date - {cluster_name}", Message=message)
+                    cluster_result['status'] = 'up_to_date'
                 else:
-                    if os.environ.get('ENABLE_AUTO_UPGRADE') == 'true' and not dry_run:
-                        eks.update_cluster_version(name=cluster_name, version=next_version)
-                        message = f"EKS cluster '{cluster_name}' upgrade initiated: {current_version} -> {next_version}"
-                        sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster Upgrade Initiated - {cluster_name}", Message=message)
-                        cluster_result['status'] = 'upgrading'
-                    else:
-                        action = "DRY RUN: Would upgrade" if dry_run else "Upgrade available"
-                        message = f"EKS cluster '{cluster_name}' {action}: {current_version} -> {next_version}"
+                    insights = eks.list_insights(clusterName=cluster_name, filter={'categories': ['UPGRADE_READINESS']})
+                    non_passing = [i for i in insights.get('insights', []) if i.get('insightStatus', {}).get('status') != 'PASSING']
+                    if non_passing:
+                        message = f"EKS cluster '{cluster_name}' upgrade blocked: {len(non_passing)} failing insights\nCurrent version: {current_version}\nNext version: {next_version}"
                         if dry_run:
                             print(f"[DRY RUN] Would send SNS: {message}")
                         else:
-                            sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster Upgrade Available for {cluster_name}", Message=message)
-                        cluster_result['status'] = 'available' if not dry_run else 'dry_run'
-            addon_results = process_cluster_addons(eks, sns, cluster_name, current_version or '', sns_topic_arn, dry_run)
-            cluster_result['addons'] = addon_results
-            results.append(cluster_result)
-        except Exception as e:
-            print(f"Error processing cluster {cluster_name}: {e}")
-            results.append({'cluster': cluster_name, 'status': 'error', 'error': str(e), 'addons': []})
-    return {'statusCode': 200, 'body': {'processed_clusters': results, 'dry_run': dry_run}}
+                            sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster Upgrade Blocked due to Potential Issue - {cluster_name}", Message=message)
+                        cluster_result['status'] = 'blocked'
+                        cluster_result['issues'] = len(non_passing)
+                    else:
+                        if os.environ.get('ENABLE_AUTO_UPGRADE') == 'true' and not dry_run:
+                            eks.update_cluster_version(name=cluster_name, version=next_version)
+                            message = f"EKS cluster '{cluster_name}' upgrade initiated: {current_version} -> {next_version}"
+                            sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster Upgrade Initiated - {cluster_name}", Message=message)
+                            cluster_result['status'] = 'upgrading'
+                        else:
+                            action = "DRY RUN: Would upgrade" if dry_run else "Upgrade available"
+                            message = f"EKS cluster '{cluster_name}' {action}: {current_version} -> {next_version}"
+                            if dry_run:
+                                print(f"[DRY RUN] Would send SNS: {message}")
+                            else:
+                                sns.publish(TopicArn=sns_topic_arn, Subject=f"EKS Cluster Upgrade Available for {cluster_name}", Message=message)
+                            cluster_result['status'] = 'available' if not dry_run else 'dry_run'
+                if store:
+                    try:
+                        store.record(cluster_name, 'cluster', [{
+                            'name': cluster_name, 'version': current_version,
+                            'target_version': next_version, 'status': cluster_result['status']
+                        }])
+                    except Exception as e:
+                        print(f"Error recording cluster state for {cluster_name}: {str(e)}")
+                addon_results = process_cluster_addons(eks, sns, cluster_name, current_version or '', sns_topic_arn, dry_run, store)
+                cluster_result['addons'] = addon_results
+                results.append(cluster_result)
+            except Exception as e:
+                print(f"Error processing cluster {cluster_name}: {e}")
+                results.append({'cluster': cluster_name, 'status': 'error', 'error': str(e), 'addons': []})
+                if store:
+                    store.touch(cluster_name)
+        body = {'processed_clusters': results, 'dry_run': dry_run}
+        if store:
+            try:
+                store.retire_unseen_clusters()
+                body['changes'] = store.changes_since_last_run()
+            except Exception as e:
+                print(f"Error finishing fleet state run: {str(e)}")
+        return {'statusCode': 200, 'body': body}
+    finally:
+        if store:
+            store.close()
@@ -0,0 +1,85 @@
+from conftest import load_checker
+
+index = load_checker('eks_version_checker')
+
+
+class StubEKS:
+    def __init__(self, addons, latest=None, failing=()):
+        self.addons = addons
+        self.latest = latest or {}
+        self.failing = set(failing)
+
+    def list_addons(self, clusterName):
+        return {'addons': list(self.addons)}
+
+    def describe_addon(self, clusterName, addonName):
+        return {'addon': {'addonName': addonName, 'addonVersion': self.addons[addonName]}}
+
+    def describe_addon_versions(self, addonName, kubernetesVersion):
+        if addonName in self.failing:
+            raise Exception('AccessDeniedException')
+        version = self.latest.get(addonName, self.addons[addonName])
+        return {'addons': [{'addonVersions': [{'addonVersion': version}]}]}
+
+    def update_addon(self, **kwargs):
+        return {'update': {'id': 'u-1'}}
+
+
+def up_to_date(name, version):
+    return {'addon_name': name, 'status': 'up_to_date', 'current_version': version,
+            'target_version': version, 'auth_type': 'none', 'error': None}
+
+
+def test_summary_lists_every_up_to_date_addon_without_store(sns):
+    results = [up_to_date('vpc-cni', 'v1.0.0'), up_to_date('coredns', 'v1.0.0')]
+    index.send_cluster_addon_summary(sns, 'arn', 'c1', results)
+    message = sns.messages[0]['Message']
+    assert 'UP-TO-DATE ADDONS:' in message
+    assert 'vpc-cni (v1.0.0)' in message and 'coredns (v1.0.0)' in message
+    assert 'unchanged since last run' not in message
+
+
+def test_summary_lists_only_changed_up_to_date_addons(sns):
+    results = [up_to_date('vpc-cni', 'v1.0.0'), up_to_date('coredns', 'v1.0.0'), up_to_date('kube-proxy', 'v1.0.0')]
+    index.send_cluster_addon_summary(sns, 'arn', 'c1', results, changed_addons={'vpc-cni'})
+    message = sns.messages[0]['Message']
+    assert 'Up-to-date addons unchanged since last run: 2' in message
+    assert 'vpc-cni (v1.0.0)' in message
+    assert 'coredns' not in message and 'kube-proxy' not in message
+
+
+def test_summary_omits_up_to_date_section_when_nothing_changed(sns):
+    index.send_cluster_addon_summary(sns, 'arn', 'c1', [up_to_date('coredns', 'v1.0.0')], changed_addons=set())
+    message = sns.messages[0]['Message']
+    assert 'Up-to-date addons unchanged since last run: 1' in message
+    assert 'UP-TO-DATE ADDONS:' not in message
+
+
+def test_failed_check_is_recorded_as_error_and_not_an_upgrade(sns, store):
+    eks = StubEKS({'coredns': 'v1.0.0-eksbuild.1'})
+    store.begin_run(now=0)
+    index.process_cluster_addons(eks, sns, 'c1', '1.30', 'arn', store=store)
+    store.begin_run(now=100)
+    eks.failing = {'coredns'}
+    results = index.process_cluster_addons(eks, sns, 'c1', '1.30', 'arn', store=store)
+    assert results[0]['status'] == 'failed'
+    assert store.conn.execute("SELECT status FROM current_state WHERE name = 'coredns'").fetchone()[0] == 'error'
+    assert store.lag_seconds('c1', 'addon', 'coredns', now=150) == 0.0
+    store.begin_run(now=200)
+    eks.failing = set()
+    index.process_cluster_addons(eks, sns, 'c1', '1.30', 'arn', store=store)
+    assert store.mean_time_to_upgrade('addon') == {}
+
+
+def test_addons_past_batch_limit_are_recorded_as_skipped(sns, store, monkeypatch):
+    monkeypatch.setenv('MAX_ADDONS_PER_RUN', '1')
+    eks = StubEKS({'vpc-cni': 'v1.0.0', 'coredns': 'v1.0.0'})
+    store.begin_run(now=0)
+    results = index.process_cluster_addons(eks, sns, 'c1', '1.30', 'arn', store=store)
+    assert [r['addon_name'] for r in results] == ['vpc-cni']
+    rows = dict(store.conn.execute("SELECT name, status FROM current_state WHERE kind = 'addon'").fetchall())
+    assert rows == {'vpc-cni': 'up_to_date', 'coredns': 'skipped'}
+    store.begin_run(now=100)
+    del eks.addons['coredns']
+    index.process_cluster_addons(eks, sns, 'c1', '1.30', 'arn', store=store)
+    assert [(c['name'], c['change']) for c in store.changes_since_last_run()] == [('coredns', 'removed')]
@@ -4,8 +4,17 @@ locals {
 
 data "archive_file" "eks_version_checker" {
   type        = "zip"
-  source_file = "${path.module}/eks_version_checker/index.py"
   output_path = "${path.module}/build/eks_version_checker.zip"
+
+  source {
+    content  = file("${path.module}/eks_version_checker/index.py")
+    filename = "index.py"
+  }
+
+  source {
+    content  = file("${path.module}/shared/fleet_state.py")
+    filename = "fleet_state.py"
+  }
 }
 
 resource "aws_lambda_function" "eks_version_checker" {
@@ -17,6 +26,9 @@ resource "aws_lambda_function" "eks_version_checker" {
   filename         = data.archive_file.eks_version_checker.output_path
   source_code_hash = data.archive_file.eks_version_checker.output_base64sha256
 
+  # One execution at a time: the fleet-state database is downloaded, updated and re-uploaded per run.
+  reserved_concurrent_executions = var.enable_fleet_state ? 1 : -1
+
   environment {
     variables = {
       SNS_TOPIC_ARN       = var.sns_topic_arn
@@ -25,14 +37,24 @@ resource "aws_lambda_function" "eks_version_checker" {
       MAX_PARALLEL_ADDONS = var.max_parallel_addons
       MAX_ADDONS_PER_RUN  = var.max_addons_per_run
       DRY_RUN             = var.dry_run ? "true" : "false"
+      FLEET_STATE_BUCKET  = var.fleet_state_bucket
     }
   }
 }
 
 data "archive_file" "nodegroup_version_checker" {
   type        = "zip"
-  source_file = "${path.module}/nodegroup_version_checker/index.py"
   output_path = "${path.module}/build/nodegroup_version_checker.zip"
+
+  source {
+    content  = file("${path.module}/nodegroup_version_checker/index.py")
+    filename = "index.py"
+  }
+
+  source {
+    content  = file("${path.module}/shared/fleet_state.py")
+    filename = "fleet_state.py"
+  }
 }
 
 resource "aws_lambda_function" "nodegroup_version_checker" {
@@ -44,11 +66,15 @@ resource "aws_lambda_function" "nodegroup_version_checker" {
   filename         = data.archive_file.nodegroup_version_checker.output_path
   source_code_hash = data.archive_file.nodegroup_version_checker.output_base64sha256
 
+  # One execution at a time: the fleet-state database is downloaded, updated and re-uploaded per run.
+  reserved_concurrent_executions = var.enable_fleet_state ? 1 : -1
+
   environment {
     variables = {
       SNS_TOPIC_ARN       = var.sns_topic_arn
       ENABLE_AUTO_UPGRADE = var.enable_auto_upgrade ? "true" : "false"
       TARGET_ENVIRONMENTS = var.target_environments
+      FLEET_STATE_BUCKET  = var.fleet_state_bucket
     }
   }
 }
@@ -1,9 +1,10 @@
 import json
 import os
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
 import boto3
 from botocore.exceptions import ClientError
+import fleet_state
 
 eks_client = boto3.client('eks')
 sns_client = boto3.client('sns')
@@ -24,7 +25,8 @@ def retry_with_backoff(func, *args, max_retries=3, **kwargs):
                 raise
 
 
-def get_cluster_nodegroups(cluster_name: str) -> List[Dict]:
+def get_cluster_nodegroups(cluster_name: str) -> Optional[List[Dict]]:
+    """Node groups of the cluster; None if they could not be listed (so the fleet state is left alone)."""
     try:
         response = retry_with_backoff(eks_client.list_nodegroups, clusterName=cluster_name)
         nodegroup_names = response.get('nodegroups', [])
@@ -48,7 +50,7 @@ def get_cluster_nodegroups(cluster_name: str) -> List[Dict]:
         return nodegroups
     except ClientError as e:
         print(f"Error listing node groups for cluster {cluster_name}: {e}")
-        return []
+        return None
 
 
 def check_nodegroup_update_available(current_k8s_version: str, cluster_k8s_version: str) -> bool:
@@ -71,7 +73,9 @@ def update_nodegroup_version(cluster_name: str, nodegroup_name: str, target_k8s_
         return {'success': False, 'update_id': None, 'error': str(e)}
 
 
-def send_nodegroup_summary(cluster_name: str, nodegroup_results: List[Dict], sns_topic_arn: str) -> None:
+def send_nodegroup_summary(cluster_name: str, nodegroup_results: List[Dict], sns_topic_arn: str,
+                           changed_nodegroups: Optional[Set[str]] = None) -> None:
+    """With changed_nodegroups (from the fleet-state store) only up-to-date node groups that changed are listed."""
     updating = [r for r in nodegroup_results if r['status'] == 'updating']
     failed = [r for r in nodegroup_results if r['status'] == 'failed']
     up_to_date = [r for r in nodegroup_results if r['status'] == 'up_to_date']
@@ -128,6 +132,12 @@ def send_nodegroup_summary(cluster_name: str, nodegroup_results: List[Dict], sns
         for result in update_available:
             message_lines.append(f"  {result['nodegroup_name']}: {result['current_version']} -> {result['target_version']}")
         message_lines.append("")
+    if changed_nodegroups is not None:
+        unchanged_count = sum(1 for r in up_to_date if r['nodegroup_name'] not in changed_nodegroups)
+        up_to_date = [r for r in up_to_date if r['nodegroup_name'] in changed_nodegroups]
+        if unchanged_count:
+            message_lines.append(f"Up-to-date node groups unchanged since last run: {unchanged_count}")
+            message_lines.append("")
     if up_to_date:
         message_lines.append("UP-TO-DATE NODE GROUPS:")
         message_lines.append("-" * 60)
@@ -146,13 +156,25 @@ def send_nodegroup_summary(cluster_name: str, nodegroup_results: List[Dict], sns
         print(f"Error sending SNS notification: {e}")
 
 
-def process_cluster_nodegroups(cluster_name: str, cluster_k8s_version: str, sns_topic_arn: str) -> List[Dict]:
+def process_cluster_nodegroups(cluster_name: str, cluster_k8s_version: str, sns_topic_arn: str,
+                               store: Optional[fleet_state.FleetStateStore] = None) -> List[Dict]:
     ENABLE_AUTO_UPGRADE = os.environ.get('ENABLE_AUTO_UPGRADE', 'true').lower() == 'true'
     nodegroups = get_cluster_nodegroups(cluster_name)
+    if nodegroups is None:
+        if store:
+            store.touch(cluster_name)
+        return []
     if not nodegroups:
+        if store:
+            try:
+                store.record(cluster_name, 'nodegroup', [])
+            except Exception as e:
+                print(f"Error recording node group state for cluster {cluster_name}: {e}")
         return []
     if not cluster_k8s_version:
         print(f"Cluster {cluster_name} has no version; skipping node groups")
+        if store:
+            store.touch(cluster_name)
         return []
     results = []
     for ng in nodegroups:
@@ -191,7 +213,16 @@ def process_cluster_nodegroups(cluster_name: str, cluster_k8s_version: str, sns_
             result['target_version'] = cluster_k8s_version
             result['error'] = str(e)
             results.append(result)
-    send_nodegroup_summary(cluster_name, results, sns_topic_arn)
+    changed_nodegroups = None
+    if store:
+        entities = [{'name': r['nodegroup_name'], 'version': r['current_version'], 'release': r['current_ami'],
+                     'target_version': r['target_version'], 'status': r['status']} for r in results]
+        try:
+            changes = store.record(cluster_name, 'nodegroup', entities)
+            changed_nodegroups = {c['name'] for c in changes}
+        except Exception as e:
+            print(f"Error recording node group state for cluster {cluster_name}: {e}")
+    send_nodegroup_summary(cluster_name, results, sns_topic_arn, changed_nodegroups)
     return results
 
 
@@ -215,6 +246,9 @@ def lambda_handler(event, context):
         return {'statusCode': 500, 'body': json.dumps({'error': 'SNS_TOPIC_ARN not configured'})}
     target_envs_raw = os.environ.get('TARGET_ENVIRONMENTS', 'dev,development')
     target_envs = [s.strip() for s in target_envs_raw.split(',') if s.strip()] if target_envs_raw else []
+    store = fleet_state.open_store('nodegroup_version_checker')
+    if store:
+        store.begin_run()
     try:
         clusters_response = eks_client.list_clusters()
         cluster_names = clusters_response.get('clusters', [])
@@ -227,10 +261,22 @@ def lambda_handler(event, context):
                 cluster_k8s_version = cluster.get('version')
                 if not cluster_matches_target_environments(cluster_name, cluster_tags, target_envs):
                     continue
-                results = process_cluster_nodegroups(cluster_name, cluster_k8s_version, SNS_TOPIC_ARN)
+                results = process_cluster_nodegroups(cluster_name, cluster_k8s_version, SNS_TOPIC_ARN, store)
                 all_results.append({'cluster': cluster_name, 'status': 'processed', 'nodegroups': results})
             except ClientError as e:
                 all_results.append({'cluster': cluster_name, 'status': 'error', 'error': str(e)})
-        return {'statusCode': 200, 'body': json.dumps({'message': 'Node group processing completed', 'clusters_processed': len(all_results), 'results': all_results})}
+                if store:
+                    store.touch(cluster_name)
+        body = {'message': 'Node group processing completed', 'clusters_processed': len(all_results), 'results': all_results}
+        if store:
+            try:
+                store.retire_unseen_clusters()
+                body['changes'] = store.changes_since_last_run()
+            except Exception as e:
+                print(f"Error finishing fleet state run: {e}")
+        return {'statusCode': 200, 'body': json.dumps(body)}
     except Exception as e:
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    finally:
+        if store:
+            store.close()
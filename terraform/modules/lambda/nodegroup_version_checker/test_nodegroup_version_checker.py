@@ -0,0 +1,76 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import load_checker
+
+index = load_checker('nodegroup_version_checker')
+
+
+class StubEKS:
+    def __init__(self, nodegroups, fail_list=False):
+        self.nodegroups = nodegroups
+        self.fail_list = fail_list
+
+    def list_nodegroups(self, clusterName):
+        if self.fail_list:
+            raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, 'ListNodegroups')
+        return {'nodegroups': list(self.nodegroups)}
+
+    def describe_nodegroup(self, clusterName, nodegroupName):
+        version, release = self.nodegroups[nodegroupName]
+        return {'nodegroup': {'nodegroupName': nodegroupName, 'version': version,
+                              'releaseVersion': release, 'status': 'ACTIVE'}}
+
+
+@pytest.fixture
+def clients(monkeypatch, sns):
+    def install(eks):
+        monkeypatch.setattr(index, 'eks_client', eks)
+        monkeypatch.setattr(index, 'sns_client', sns)
+        return eks
+    return install
+
+
+def up_to_date(name):
+    return {'nodegroup_name': name, 'status': 'up_to_date', 'current_version': '1.30',
+            'target_version': None, 'current_ami': 'ami-1', 'update_id': None, 'error': None}
+
+
+def test_summary_lists_only_changed_up_to_date_nodegroups(clients, sns):
+    clients(None)
+    index.send_nodegroup_summary('c1', [up_to_date('ng-a'), up_to_date('ng-b')], 'arn', changed_nodegroups={'ng-b'})
+    message = sns.messages[0]['Message']
+    assert 'Up-to-date node groups unchanged since last run: 1' in message
+    assert 'ng-b (1.30, AMI: ami-1)' in message
+    assert 'ng-a' not in message
+
+
+def test_summary_lists_every_up_to_date_nodegroup_without_store(clients, sns):
+    clients(None)
+    index.send_nodegroup_summary('c1', [up_to_date('ng-a'), up_to_date('ng-b')], 'arn')
+    message = sns.messages[0]['Message']
+    assert 'ng-a (1.30, AMI: ami-1)' in message and 'ng-b (1.30, AMI: ami-1)' in message
+    assert 'unchanged since last run' not in message
+
+
+def test_last_nodegroup_deleted_is_recorded_as_removed(clients, store):
+    eks = clients(StubEKS({'ng-a': ('1.30', 'ami-1')}))
+    store.begin_run(now=0)
+    index.process_cluster_nodegroups('c1', '1.30', 'arn', store)
+    store.begin_run(now=100)
+    eks.nodegroups = {}
+    assert index.process_cluster_nodegroups('c1', '1.30', 'arn', store) == []
+    assert [(c['name'], c['change']) for c in store.changes_since_last_run()] == [('ng-a', 'removed')]
+
+
+def test_listing_failure_keeps_nodegroup_state(clients, store):
+    eks = clients(StubEKS({'ng-a': ('1.30', 'ami-1')}))
+    store.begin_run(now=0)
+    index.process_cluster_nodegroups('c1', '1.30', 'arn', store)
+    store.begin_run(now=100)
+    eks.fail_list = True
+    assert index.get_cluster_nodegroups('c1') is None
+    assert index.process_cluster_nodegroups('c1', '1.30', 'arn', store) == []
+    assert store.retire_unseen_clusters() == []
+    assert store.changes_since_last_run() == []
+    assert store.lag_seconds('c1', 'nodegroup', 'ng-a') == 0.0
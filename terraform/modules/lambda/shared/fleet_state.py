@@ -0,0 +1,268 @@
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_time ON runs (run_time);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    run_id INTEGER NOT NULL,
+    cluster TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT,
+    release TEXT,
+    target_version TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_run ON snapshots (run_id);
+CREATE INDEX IF NOT EXISTS idx_snapshots_cluster ON snapshots (cluster, run_id);
+CREATE INDEX IF NOT EXISTS idx_snapshots_name ON snapshots (kind, name, run_id);
+
+CREATE TABLE IF NOT EXISTS current_state (
+    cluster TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT,
+    release TEXT,
+    target_version TEXT,
+    status TEXT,
+    behind_since REAL,
+    last_run_id INTEGER NOT NULL,
+    PRIMARY KEY (cluster, kind, name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS changes (
+    run_id INTEGER NOT NULL,
+    cluster TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    change TEXT NOT NULL,
+    old_version TEXT,
+    new_version TEXT,
+    old_status TEXT,
+    new_status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_changes_run ON changes (run_id);
+CREATE INDEX IF NOT EXISTS idx_changes_cluster ON changes (cluster, run_id);
+
+CREATE TABLE IF NOT EXISTS upgrades (
+    run_id INTEGER NOT NULL,
+    cluster TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    from_version TEXT,
+    to_version TEXT,
+    behind_since REAL NOT NULL,
+    upgraded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_upgrades_name ON upgrades (kind, name);
+"""
+
+# Statuses that say nothing about whether the entity is behind (e.g. node group not ACTIVE).
+NEUTRAL_STATUSES = ('skipped', 'error')
+TRACKED_FIELDS = ('version', 'release', 'target_version', 'status')
+
+
+def is_behind(status: Optional[str]) -> Optional[bool]:
+    """True if behind latest, False if up to date, None if the status is inconclusive."""
+    if status in NEUTRAL_STATUSES or status is None:
+        return None
+    return status != 'up_to_date'
+
+
+class FleetStateStore:
+    """Append-only SQLite store of per-run snapshots, diffed against current_state on write."""
+
+    def __init__(self, path: str, bucket: Optional[str] = None, key: Optional[str] = None):
+        self.path = path
+        self.bucket = bucket
+        self.key = key
+        self.run_id = None
+        self.run_time = None
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def begin_run(self, now: Optional[float] = None) -> int:
+        self.run_time = now if now is not None else time.time()
+        cur = self.conn.execute("INSERT INTO runs (run_time) VALUES (?)", (self.run_time,))
+        self.run_id = cur.lastrowid
+        return self.run_id
+
+    def record(self, cluster: str, kind: str, entities: List[Dict], complete: bool = True) -> List[Dict]:
+        """Snapshot entities (name, version, release, target_version, status) for one cluster and return what changed.
+
+        Only the previous state of this cluster/kind is read, never older runs. With complete=False
+        missing entities are not reported as removed and keep their current_state row unchanged; pass
+        entities that were not checked with a neutral status ('skipped') instead where possible.
+        """
+        if self.run_id is None:
+            self.begin_run()
+        previous = {
+            row['name']: row for row in self.conn.execute(
+                "SELECT * FROM current_state WHERE cluster = ? AND kind = ?", (cluster, kind))
+        }
+        changes = []
+        seen = set()
+        for entity in entities:
+            name = entity['name']
+            seen.add(name)
+            values = {f: entity.get(f) for f in TRACKED_FIELDS}
+            self.conn.execute(
+                "INSERT INTO snapshots (run_id, cluster, kind, name, version, release, target_version, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, cluster, kind, name, values['version'], values['release'],
+                 values['target_version'], values['status']))
+            old = previous.get(name)
+            behind_since = old['behind_since'] if old else None
+            behind = is_behind(values['status'])
+            if behind and behind_since is None:
+                behind_since = self.run_time
+            elif behind is False and behind_since is not None:
+                if old['version'] != values['version']:
+                    self.conn.execute(
+                        "INSERT INTO upgrades (run_id, cluster, kind, name, from_version, to_version, behind_since, upgraded_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (self.run_id, cluster, kind, name, old['version'], values['version'], behind_since, self.run_time))
+                behind_since = None
+            if old is None:
+                changes.append(self._change(cluster, kind, name, 'added', None, values))
+            elif any(old[f] != values[f] for f in TRACKED_FIELDS):
+                changes.append(self._change(cluster, kind, name, 'changed', old, values))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO current_state "
+                "(cluster, kind, name, version, release, target_version, status, behind_since, last_run_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (cluster, kind, name, values['version'], values['release'], values['target_version'],
+                 values['status'], behind_since, self.run_id))
+        if complete:
+            for name, old in previous.items():
+                if name in seen:
+                    continue
+                changes.append(self._change(cluster, kind, name, 'removed', old, None))
+                self.conn.execute(
+                    "DELETE FROM current_state WHERE cluster = ? AND kind = ? AND name = ?", (cluster, kind, name))
+        self.conn.commit()
+        return changes
+
+    def _change(self, cluster: str, kind: str, name: str, change: str, old, new: Optional[Dict]) -> Dict:
+        row = {
+            'cluster': cluster, 'kind': kind, 'name': name, 'change': change,
+            'old_version': old['version'] if old else None,
+            'new_version': new['version'] if new else None,
+            'old_status': old['status'] if old else None,
+            'new_status': new['status'] if new else None
+        }
+        self.conn.execute(
+            "INSERT INTO changes (run_id, cluster, kind, name, change, old_version, new_version, old_status, new_status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.run_id, cluster, kind, name, change, row['old_version'], row['new_version'],
+             row['old_status'], row['new_status']))
+        return row
+
+    def touch(self, cluster: str) -> None:
+        """Keep a cluster's current_state as is for this run (it exists but could not be read)."""
+        self.conn.execute("UPDATE current_state SET last_run_id = ? WHERE cluster = ?", (self.run_id, cluster))
+        self.conn.commit()
+
+    def retire_unseen_clusters(self) -> List[Dict]:
+        """Mark clusters not recorded or touched in this run as removed and drop their current_state rows."""
+        rows = self.conn.execute(
+            "SELECT cluster FROM current_state GROUP BY cluster HAVING MAX(last_run_id) != ?", (self.run_id,)).fetchall()
+        changes = []
+        for row in rows:
+            cluster = row['cluster']
+            for old in self.conn.execute(
+                    "SELECT * FROM current_state WHERE cluster = ?", (cluster,)).fetchall():
+                changes.append(self._change(cluster, old['kind'], old['name'], 'removed', old, None))
+            self.conn.execute("DELETE FROM current_state WHERE cluster = ?", (cluster,))
+        self.conn.commit()
+        return changes
+
+    def last_run_id(self) -> Optional[int]:
+        row = self.conn.execute("SELECT MAX(run_id) AS run_id FROM runs").fetchone()
+        return row['run_id']
+
+    def changes_since_last_run(self, cluster: Optional[str] = None) -> List[Dict]:
+        """Changes recorded by the most recent run (optionally for one cluster)."""
+        run_id = self.last_run_id()
+        if run_id is None:
+            return []
+        query = "SELECT cluster, kind, name, change, old_version, new_version, old_status, new_status FROM changes WHERE run_id = ?"
+        params = [run_id]
+        if cluster:
+            query += " AND cluster = ?"
+            params.append(cluster)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def lag_seconds(self, cluster: str, kind: str = 'cluster', name: Optional[str] = None,
+                    now: Optional[float] = None) -> Optional[float]:
+        """Seconds the entity has been behind latest (0.0 if up to date, None if never seen)."""
+        row = self.conn.execute(
+            "SELECT behind_since FROM current_state WHERE cluster = ? AND kind = ? AND name = ?",
+            (cluster, kind, name or cluster)).fetchone()
+        if row is None:
+            return None
+        if row['behind_since'] is None:
+            return 0.0
+        return (now if now is not None else time.time()) - row['behind_since']
+
+    def mean_time_to_upgrade(self, kind: str = 'addon') -> Dict[str, float]:
+        """Mean seconds from first seen behind to seen up to date, per entity name across clusters."""
+        rows = self.conn.execute(
+            "SELECT name, AVG(upgraded_at - behind_since) AS mean_seconds FROM upgrades WHERE kind = ? GROUP BY name",
+            (kind,))
+        return {row['name']: row['mean_seconds'] for row in rows}
+
+    def close(self) -> None:
+        """Commit, close and upload the database to S3 when a bucket is configured.
+
+        Upload errors are only logged: by now upgrades and SNS messages have gone out, and failing
+        the invocation would make the scheduler retry the whole run.
+        """
+        self.conn.commit()
+        self.conn.close()
+        if self.bucket:
+            try:
+                boto3.client('s3').upload_file(self.path, self.bucket, self.key)
+            except Exception as e:
+                print(f"Error uploading fleet state to s3://{self.bucket}/{self.key}: {e}")
+
+
+def open_store(source: str) -> Optional[FleetStateStore]:
+    """Open the fleet-state store for a checker; None if FLEET_STATE_BUCKET and FLEET_STATE_PATH are unset.
+
+    Lambda /tmp does not survive cold starts, so the database is pulled from and pushed back to S3.
+    """
+    bucket = os.environ.get('FLEET_STATE_BUCKET', '')
+    path = os.environ.get('FLEET_STATE_PATH', '')
+    if not bucket and not path:
+        return None
+    path = path or f"/tmp/{source}.db"
+    key = f"fleet-state/{source}.db"
+    if bucket:
+        try:
+            boto3.client('s3').download_file(bucket, key, path)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code', '') not in ('404', 'NoSuchKey'):
+                print(f"Error downloading fleet state from s3://{bucket}/{key}: {e}")
+                return None
+            if os.path.exists(path):
+                os.remove(path)
+        except BotoCoreError as e:
+            print(f"Error downloading fleet state from s3://{bucket}/{key}: {e}")
+            return None
+    try:
+        return FleetStateStore(path, bucket or None, key)
+    except sqlite3.Error as e:
+        print(f"Error opening fleet state at {path}: {e}")
+        return None
@@ -0,0 +1,89 @@
+import fleet_state
+
+
+def addon(name, version, status='up_to_date', target_version=None):
+    return {'name': name, 'version': version, 'target_version': target_version or version, 'status': status}
+
+
+def test_first_run_reports_all_added(store):
+    store.begin_run(now=0)
+    changes = store.record('c1', 'addon', [addon('vpc-cni', 'v1'), addon('coredns', 'v1')])
+    assert sorted((c['name'], c['change']) for c in changes) == [('coredns', 'added'), ('vpc-cni', 'added')]
+    assert len(store.changes_since_last_run()) == 2
+
+
+def test_unchanged_run_reports_nothing(store):
+    entities = [addon('vpc-cni', 'v1'), addon('coredns', 'v1')]
+    store.begin_run(now=0)
+    store.record('c1', 'addon', entities)
+    store.begin_run(now=100)
+    assert store.record('c1', 'addon', entities) == []
+    assert store.changes_since_last_run() == []
+
+
+def test_truncated_batch_does_not_report_removed(store):
+    store.begin_run(now=0)
+    store.record('c1', 'addon', [addon('vpc-cni', 'v1'), addon('coredns', 'v1')])
+    store.begin_run(now=100)
+    assert store.record('c1', 'addon', [addon('vpc-cni', 'v1')], complete=False) == []
+    changes = store.record('c1', 'addon', [addon('vpc-cni', 'v1')])
+    assert [(c['name'], c['change']) for c in changes] == [('coredns', 'removed')]
+
+
+def test_behind_to_up_to_date_records_upgrade(store):
+    store.begin_run(now=0)
+    store.record('c1', 'addon', [addon('vpc-cni', 'v1', 'updated', 'v2')])
+    store.record('c2', 'addon', [addon('vpc-cni', 'v1', 'failed', 'v2')])
+    store.begin_run(now=100)
+    store.record('c1', 'addon', [addon('vpc-cni', 'v2')])
+    store.record('c2', 'addon', [addon('vpc-cni', 'v1', 'failed', 'v2')])
+    store.begin_run(now=300)
+    store.record('c1', 'addon', [addon('vpc-cni', 'v2')])
+    store.record('c2', 'addon', [addon('vpc-cni', 'v2')])
+    rows = store.conn.execute("SELECT cluster, from_version, to_version FROM upgrades ORDER BY cluster").fetchall()
+    assert [tuple(r) for r in rows] == [('c1', 'v1', 'v2'), ('c2', 'v1', 'v2')]
+    assert store.mean_time_to_upgrade('addon') == {'vpc-cni': 200.0}
+
+
+def test_check_failure_does_not_record_upgrade(store):
+    store.begin_run(now=0)
+    store.record('c1', 'addon', [addon('coredns', 'v1')])
+    store.begin_run(now=100)
+    store.record('c1', 'addon', [{'name': 'coredns', 'version': 'v1', 'status': 'error'}])
+    assert store.lag_seconds('c1', 'addon', 'coredns', now=150) == 0.0
+    store.begin_run(now=200)
+    store.record('c1', 'addon', [addon('coredns', 'v1')])
+    assert store.conn.execute("SELECT COUNT(*) FROM upgrades").fetchone()[0] == 0
+    assert store.mean_time_to_upgrade('addon') == {}
+
+
+def test_behind_then_up_to_date_at_same_version_is_not_an_upgrade(store):
+    store.begin_run(now=0)
+    store.record('c1', 'addon', [addon('coredns', 'v1', 'failed', 'v2')])
+    store.begin_run(now=100)
+    store.record('c1', 'addon', [addon('coredns', 'v1')])
+    assert store.mean_time_to_upgrade('addon') == {}
+    assert store.lag_seconds('c1', 'addon', 'coredns', now=150) == 0.0
+
+
+def test_lag_seconds(store):
+    store.begin_run(now=0)
+    store.record('behind', 'cluster', [{'name': 'behind', 'version': '1.29', 'target_version': '1.30', 'status': 'available'}])
+    store.record('current', 'cluster', [{'name': 'current', 'version': '1.30', 'status': 'up_to_date'}])
+    assert store.lag_seconds('behind', now=250) == 250.0
+    assert store.lag_seconds('current', now=250) == 0.0
+    assert store.lag_seconds('unknown', now=250) is None
+
+
+def test_unseen_cluster_is_retired(store):
+    store.begin_run(now=0)
+    store.record('gone', 'cluster', [{'name': 'gone', 'version': '1.29', 'target_version': '1.30', 'status': 'available'}])
+    store.record('gone', 'addon', [addon('vpc-cni', 'v1')])
+    store.record('kept', 'cluster', [{'name': 'kept', 'version': '1.30', 'status': 'up_to_date'}])
+    store.begin_run(now=100)
+    store.touch('kept')
+    changes = store.retire_unseen_clusters()
+    assert sorted((c['cluster'], c['kind'], c['change']) for c in changes) == [
+        ('gone', 'addon', 'removed'), ('gone', 'cluster', 'removed')]
+    assert store.lag_seconds('gone', now=1000) is None
+    assert store.lag_seconds('kept', now=1000) == 0.0
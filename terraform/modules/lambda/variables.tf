@@ -40,7 +40,7 @@ variable "max_parallel_addons" {
 variable "max_addons_per_run" {
   type        = number
   default     = 30
-  description = "Maximum number of addons to process per Lambda execution. Default: 30. Remaining addons will be processed in the next scheduled run."
+  description = "Maximum number of addons to process per Lambda execution. Default: 30. The same first addons (in ListAddons order) are processed every run; the rest are not checked."
 }
 
 variable "dry_run" {
@@ -48,3 +48,15 @@ variable "dry_run" {
   default     = false
   description = "Enable dry-run mode to simulate updates without making changes. Useful for testing without a cluster."
 }
+
+variable "enable_fleet_state" {
+  type        = bool
+  default     = false
+  description = "Limit each Lambda to one concurrent execution so fleet-state uploads cannot overwrite each other"
+}
+
+variable "fleet_state_bucket" {
+  type        = string
+  default     = ""
+  description = "S3 bucket for the per-run fleet-state SQLite databases. Empty = history not recorded."
+}
@@ -68,7 +68,7 @@ variable "max_parallel_addons" {
 variable "max_addons_per_run" {
   type        = number
   default     = 30
-  description = "Maximum number of addons to process per Lambda execution. Remaining addons will be processed in the next scheduled run."
+  description = "Maximum number of addons to process per Lambda execution. The same first addons (in ListAddons order) are processed every run; the rest are not checked."
 
   validation {
     condition     = var.max_addons_per_run >= 1 && var.max_addons_per_run <= 100
@@ -81,3 +81,9 @@ variable "dry_run" {
   default     = false
   description = "Enable dry-run mode to simulate updates without making changes. Useful for testing without a cluster."
 }
+
+variable "enable_fleet_state" {
+  type        = bool
+  default     = false
+  description = "Record each run's cluster/addon/node group state in an S3-backed SQLite store; SNS summaries then list only what changed since the last run."
+}